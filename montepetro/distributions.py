@@ -0,0 +1,47 @@
+import logging
+
+import numpy as np
+
+SCIPY_DISTRIBUTIONS = ("norm", "lognorm", "uniform", "triang", "truncnorm")
+
+# frozen scipy distributions keyed by (name, params); freezing binds the
+# shape parameters once so repeated rvs/ppf calls skip argument checking
+_frozen_cache = {}
+
+
+def frozen(name, **params):
+    # deferred import, scipy.stats is expensive to load and not every
+    # model uses it
+    import scipy.stats
+    if name not in SCIPY_DISTRIBUTIONS:
+        logging.log(logging.ERROR, "Unknown distribution " + str(name) + ".")
+        raise KeyError
+    key = (name, tuple(sorted(params.items())))
+    distribution = _frozen_cache.get(key)
+    if distribution is None:
+        distribution = getattr(scipy.stats, name)(**params)
+        _frozen_cache[key] = distribution
+    return distribution
+
+
+# direct numpy draws for the hot distributions, scipy's rvs goes through
+# a generic RNG adapter that is several times slower than one vectorized
+# standard draw plus an affine transform
+_FAST = {"norm": lambda state, size, loc=0.0, scale=1.0:
+         state.standard_normal(size)*scale + loc,
+         "lognorm": lambda state, size, s=1.0, loc=0.0, scale=1.0:
+         np.exp(state.standard_normal(size)*s)*scale + loc,
+         "uniform": lambda state, size, loc=0.0, scale=1.0:
+         state.random_sample(size)*scale + loc}
+
+
+def rvs(name, size, random_state=None, **params):
+    state = random_state if random_state is not None else np.random
+    fast = _FAST.get(name)
+    if fast is not None:
+        return fast(state, size, **params)
+    return frozen(name, **params).rvs(size=size, random_state=random_state)
+
+
+def clear_cache():
+    _frozen_cache.clear()
@@ -0,0 +1,375 @@
+import ast
+import operator
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    # optional, evaluates array formulas in one fused multi-threaded pass
+    import numexpr
+except ImportError:
+    numexpr = None
+
+MAX_FORMULA_LENGTH = 255
+MAX_CACHED_FORMULAS = 128
+
+# parsed formulas keyed by formula string in least-recently-used order,
+# a Monte Carlo run evaluates the same formula thousands of times and
+# must not re-parse it; failed parses are never cached
+_ast_cache = OrderedDict()
+
+
+class FormulaSyntaxError(Exception):
+    pass
+
+
+def clear_cache():
+    _ast_cache.clear()
+    _bytecode_cache.clear()
+    _code_cache.clear()
+
+
+def parse_formula(formula):
+    if len(formula) > MAX_FORMULA_LENGTH:
+        raise FormulaSyntaxError("Formula exceeds " + str(MAX_FORMULA_LENGTH) + " characters.")
+    node = _ast_cache.get(formula)
+    if node is not None:
+        # refresh recency
+        del _ast_cache[formula]
+        _ast_cache[formula] = node
+        return node
+    try:
+        node = ast.parse(formula, "<formula>", "eval")
+    except SyntaxError as error:
+        # error.offset is already a character offset, no byte/char
+        # recoding pass is needed to point at the failure
+        raise FormulaSyntaxError("Could not parse formula: " + formula +
+                                 " (column " + str(error.offset) + ")")
+    node = fold_constants(node)
+    if len(_ast_cache) >= MAX_CACHED_FORMULAS:
+        _ast_cache.popitem(last=False)
+    _ast_cache[formula] = node
+    return node
+
+
+# operator tables built once at import, not per evaluated node
+_BINOPS = {ast.Add: operator.add, ast.Sub: operator.sub,
+           ast.Mult: operator.mul, ast.Div: operator.truediv,
+           ast.Pow: operator.pow}
+_UNARYOPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def eval_expression(node, variables):
+    return eval_node(node.body, variables)
+
+
+def eval_num(node, variables):
+    return node.n
+
+
+def eval_name(node, variables):
+    try:
+        return variables[node.id]
+    except KeyError:
+        raise FormulaSyntaxError("Undefined variable " + str(node.id) + " in formula.")
+
+
+def eval_binop(node, variables):
+    try:
+        op = _BINOPS[type(node.op)]
+    except KeyError:
+        raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+    return op(eval_node(node.left, variables), eval_node(node.right, variables))
+
+
+def eval_unaryop(node, variables):
+    try:
+        op = _UNARYOPS[type(node.op)]
+    except KeyError:
+        raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+    return op(eval_node(node.operand, variables))
+
+
+_EVALUATORS = {ast.Expression: eval_expression, ast.BinOp: eval_binop,
+               ast.UnaryOp: eval_unaryop, ast.Num: eval_num, ast.Name: eval_name}
+
+
+def eval_node(node, variables):
+    # single type lookup instead of an isinstance ladder per node
+    evaluator = _EVALUATORS.get(type(node))
+    if evaluator is None:
+        raise FormulaSyntaxError("Illegal node " + type(node).__name__ + " in formula.")
+    return evaluator(node, variables)
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    # collapse constant sub-expressions once at parse time so no trial
+    # re-computes them; anything that cannot fold is left untouched
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.left, ast.Num) and isinstance(node.right, ast.Num):
+            op = _BINOPS.get(type(node.op))
+            if op is not None:
+                try:
+                    return ast.copy_location(ast.Num(op(node.left.n, node.right.n)), node)
+                except ArithmeticError:
+                    return node
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.operand, ast.Num):
+            op = _UNARYOPS.get(type(node.op))
+            if op is not None:
+                return ast.copy_location(ast.Num(op(node.operand.n)), node)
+        return node
+
+
+def fold_constants(node):
+    return _ConstantFolder().visit(node)
+
+
+# opcodes of the flat formula programs run by evaluate_bytecode
+(OP_CONST, OP_VAR, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_POW, OP_POS, OP_NEG,
+ OP_ADDN, OP_MULN) = range(11)
+
+_BINOP_CODES = {ast.Add: OP_ADD, ast.Sub: OP_SUB, ast.Mult: OP_MUL,
+                ast.Div: OP_DIV, ast.Pow: OP_POW}
+_UNARYOP_CODES = {ast.UAdd: OP_POS, ast.USub: OP_NEG}
+_BINOP_FUNCTIONS = {OP_ADD: operator.add, OP_SUB: operator.sub,
+                    OP_MUL: operator.mul, OP_DIV: operator.truediv,
+                    OP_POW: operator.pow}
+# chains of one associative operator collapse into a single n-ary
+# reduction, a*b*c*d is one np.multiply.reduce instead of three
+# dispatches with two intermediates
+_NARY_CODES = {ast.Add: OP_ADDN, ast.Mult: OP_MULN}
+_NARY_FUNCTIONS = {OP_ADDN: np.add.reduce, OP_MULN: np.multiply.reduce}
+_BINOP_UFUNCS = {OP_ADD: np.add, OP_SUB: np.subtract, OP_MUL: np.multiply,
+                 OP_DIV: np.true_divide, OP_POW: np.power}
+
+_bytecode_cache = {}
+
+
+def _flatten_chain(node, op_type, operands):
+    # collect the leaves of a left-nested chain of one associative op
+    if isinstance(node, ast.BinOp) and type(node.op) is op_type:
+        _flatten_chain(node.left, op_type, operands)
+        _flatten_chain(node.right, op_type, operands)
+    else:
+        operands.append(node)
+
+
+def _emit(node, ops, consts, names):
+    if isinstance(node, ast.Expression):
+        _emit(node.body, ops, consts, names)
+    elif isinstance(node, ast.BinOp) and type(node.op) in _NARY_CODES:
+        operands = []
+        _flatten_chain(node, type(node.op), operands)
+        for operand in operands:
+            _emit(operand, ops, consts, names)
+        if len(operands) > 2:
+            ops.append((_NARY_CODES[type(node.op)], len(operands)))
+        else:
+            ops.append((_BINOP_CODES[type(node.op)], 0))
+    elif isinstance(node, ast.BinOp):
+        _emit(node.left, ops, consts, names)
+        _emit(node.right, ops, consts, names)
+        try:
+            ops.append((_BINOP_CODES[type(node.op)], 0))
+        except KeyError:
+            raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+    elif isinstance(node, ast.UnaryOp):
+        _emit(node.operand, ops, consts, names)
+        try:
+            ops.append((_UNARYOP_CODES[type(node.op)], 0))
+        except KeyError:
+            raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+    elif isinstance(node, ast.Num):
+        ops.append((OP_CONST, len(consts)))
+        consts.append(node.n)
+    elif isinstance(node, ast.Name):
+        if node.id not in names:
+            names.append(node.id)
+        ops.append((OP_VAR, names.index(node.id)))
+    else:
+        raise FormulaSyntaxError("Illegal node " + type(node).__name__ + " in formula.")
+
+
+def compile_to_bytecode(formula):
+    # one flat postfix program per formula, compiled and cached once
+    program = _bytecode_cache.get(formula)
+    if program is None:
+        ops, consts, names = [], [], []
+        _emit(parse_formula(formula), ops, consts, names)
+        program = (ops, consts, names)
+        _bytecode_cache[formula] = program
+    return program
+
+
+def _take_scratch(free, shape, dtype):
+    # reuse a released intermediate of the right shape and dtype,
+    # allocate only when none is available
+    for index, buffer in enumerate(free):
+        if buffer.shape == shape and buffer.dtype == dtype:
+            return free.pop(index)
+    return np.empty(shape, dtype)
+
+
+def evaluate_bytecode(formula, variables):
+    ops, consts, names = compile_to_bytecode(formula)
+    try:
+        values = [variables[name] for name in names]
+    except KeyError as error:
+        raise FormulaSyntaxError("Undefined variable " + str(error.args[0]) + " in formula.")
+    # array intermediates ping-pong through per-call scratch buffers via
+    # the ufunc out= argument: a consumed intermediate is either the
+    # target of its own operation or returned to the free list, so a long
+    # formula reuses a handful of arrays instead of allocating one fresh
+    # ndarray per operation; caller arrays are never written to
+    stack = []
+    owned = []
+    free = []
+    for op, arg in ops:
+        if op == OP_CONST:
+            stack.append(consts[arg])
+            owned.append(False)
+        elif op == OP_VAR:
+            stack.append(values[arg])
+            owned.append(False)
+        elif op == OP_NEG:
+            value = stack[-1]
+            if isinstance(value, np.ndarray):
+                out = value if owned[-1] else _take_scratch(free, value.shape, value.dtype)
+                stack[-1] = np.negative(value, out=out)
+                owned[-1] = True
+            else:
+                stack[-1] = -value
+        elif op == OP_POS:
+            pass
+        elif op == OP_ADDN or op == OP_MULN:
+            operands = stack[-arg:]
+            flags = owned[-arg:]
+            del stack[-arg:]
+            del owned[-arg:]
+            result = _NARY_FUNCTIONS[op](operands)
+            for operand, flag in zip(operands, flags):
+                if flag:
+                    free.append(operand)
+            stack.append(result)
+            owned.append(isinstance(result, np.ndarray))
+        else:
+            right = stack.pop()
+            left = stack.pop()
+            right_owned = owned.pop()
+            left_owned = owned.pop()
+            left_is_array = isinstance(left, np.ndarray)
+            right_is_array = isinstance(right, np.ndarray)
+            if ((left_is_array or right_is_array)
+                    and (not left_is_array or not right_is_array
+                         or left.shape == right.shape)):
+                shape = left.shape if left_is_array else right.shape
+                dtype = np.result_type(left, right)
+                # ufuncs allow out= to alias an input, a consumed scratch
+                # operand is the cheapest target
+                if left_owned and left_is_array and left.dtype == dtype:
+                    out = left
+                elif right_owned and right_is_array and right.dtype == dtype:
+                    out = right
+                else:
+                    out = _take_scratch(free, shape, dtype)
+                result = _BINOP_UFUNCS[op](left, right, out=out)
+                if left_owned and left is not out:
+                    free.append(left)
+                if right_owned and right is not out:
+                    free.append(right)
+                stack.append(result)
+                owned.append(True)
+            else:
+                result = _BINOP_FUNCTIONS[op](left, right)
+                stack.append(result)
+                owned.append(left_is_array or right_is_array)
+    return stack.pop()
+
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Num,
+                  ast.Name, ast.Load) + tuple(_BINOPS) + tuple(_UNARYOPS)
+
+_code_cache = {}
+
+
+def compile_formula(formula):
+    # validated and compiled to a CPython code object once per formula,
+    # evaluation is then a single C-level eval with no builtins exposed
+    cached = _code_cache.get(formula)
+    if cached is None:
+        node = parse_formula(formula)
+        names = set()
+        for child in ast.walk(node):
+            if not isinstance(child, _ALLOWED_NODES):
+                raise FormulaSyntaxError("Illegal node " + type(child).__name__ + " in formula.")
+            if isinstance(child, ast.Name):
+                names.add(child.id)
+        cached = (compile(node, "<formula>", "eval"), names)
+        _code_cache[formula] = cached
+    return cached
+
+
+def _node_key(node):
+    # canonical key of a subtree, equal subtrees share one key
+    if isinstance(node, ast.Expression):
+        return _node_key(node.body)
+    if isinstance(node, ast.Num):
+        return ("num", node.n)
+    if isinstance(node, ast.Name):
+        return ("var", node.id)
+    if isinstance(node, ast.BinOp):
+        return (type(node.op).__name__, _node_key(node.left), _node_key(node.right))
+    if isinstance(node, ast.UnaryOp):
+        return (type(node.op).__name__, _node_key(node.operand))
+    raise FormulaSyntaxError("Illegal node " + type(node).__name__ + " in formula.")
+
+
+def _eval_node_memo(node, variables, memo):
+    if isinstance(node, ast.Expression):
+        return _eval_node_memo(node.body, variables, memo)
+    key = _node_key(node)
+    if key in memo:
+        return memo[key]
+    if isinstance(node, ast.BinOp):
+        op = _BINOPS.get(type(node.op))
+        if op is None:
+            raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+        value = op(_eval_node_memo(node.left, variables, memo),
+                   _eval_node_memo(node.right, variables, memo))
+    elif isinstance(node, ast.UnaryOp):
+        op = _UNARYOPS.get(type(node.op))
+        if op is None:
+            raise FormulaSyntaxError("Illegal operation " + type(node.op).__name__ + " in formula.")
+        value = op(_eval_node_memo(node.operand, variables, memo))
+    else:
+        value = eval_node(node, variables)
+    memo[key] = value
+    return value
+
+
+def evaluate_many(formulas, variables):
+    # result formulas often share factors, evaluate them against one
+    # memo so every common sub-expression is computed exactly once
+    memo = {}
+    results = {}
+    for name, formula in formulas.iteritems():
+        results[name] = _eval_node_memo(parse_formula(formula), variables, memo)
+    return results
+
+
+def evaluate(formula, variables):
+    # compiling validates the formula and caches the code object
+    code, names = compile_formula(formula)
+    for name in names:
+        if name not in variables:
+            raise FormulaSyntaxError("Undefined variable " + str(name) + " in formula.")
+    if numexpr is not None and any(isinstance(value, np.ndarray)
+                                   for value in variables.values()):
+        # fused single pass over the arrays, no per-operation temporaries
+        return numexpr.evaluate(formula, local_dict=variables, global_dict={})
+    return eval(code, {"__builtins__": {}}, variables)
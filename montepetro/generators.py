@@ -1,18 +1,65 @@
 import numpy as np
 
+try:
+    # SFC64 is roughly twice as fast per draw as the Mersenne Twister,
+    # only newer numpy releases ship the bit generator API
+    from numpy.random import Generator, SFC64
+    DEFAULT_BIT_GENERATOR = SFC64
+except ImportError:
+    Generator = None
+    DEFAULT_BIT_GENERATOR = None
+
+
+def make_rng(seed=None):
+    # central factory for private sampling streams, switch the default
+    # bit generator here rather than at every call site
+    if DEFAULT_BIT_GENERATOR is not None:
+        return Generator(DEFAULT_BIT_GENERATOR(seed))
+    return np.random.RandomState(seed)
+
 
 class RandomGenerator(object):
-    def __init__(self, seed, n, random_number_function):
+    __slots__ = ("seed", "random_state_class", "random_state",
+                 "N", "_random_number_function", "_resolved_function")
+
+    def __init__(self, seed, n, random_number_function, random_state_class=None):
         self.seed = seed
+        self.random_state_class = random_state_class
+        self.random_state = None
         self.set_seed()
         self.N = n
         self.random_number_function = random_number_function
 
     def set_seed(self):
-        np.random.seed(self.seed)
+        if self.random_state_class is None:
+            np.random.seed(self.seed)
+        else:
+            self.random_state = self.random_state_class(self.seed)
+        # rebind the cached draw function to the fresh stream
+        try:
+            self.random_number_function = self._random_number_function
+        except AttributeError:
+            pass
+
+    @property
+    def random_number_function(self):
+        return self._random_number_function
+
+    @random_number_function.setter
+    def random_number_function(self, function):
+        self._random_number_function = function
+        self._resolved_function = self.resolve_random_number_function()
+
+    def resolve_random_number_function(self):
+        # prefer the equivalent method on the private stream if one exists
+        if self.random_state is not None:
+            return getattr(self.random_state,
+                           self._random_number_function.__name__,
+                           self._random_number_function)
+        return self._random_number_function
 
     def get_random_number(self, *args, **kwargs):
-        return np.array(self.random_number_function(*args, **kwargs))
+        return np.array(self._resolved_function(*args, **kwargs))
 
     def get_n_random_numbers(self, *args, **kwargs):
-        return self.random_number_function(size=self.N, *args, **kwargs)
+        return self._resolved_function(size=self.N, *args, **kwargs)
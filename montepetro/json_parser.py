@@ -1,62 +1,66 @@
 __author__ = 'lmosser'
 import json
 import logging
+import os
+
+from montepetro.regions import Region
+
+# parsed configurations keyed by file name, shared by all parser
+# instances and invalidated when the file changes on disk
+_json_cache = {}
+
+
+def load_json(file_name):
+    mtime = os.path.getmtime(file_name)
+    cached = _json_cache.get(file_name)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(file_name) as json_data:
+        data = json.load(json_data)
+    _json_cache[file_name] = (mtime, data)
+    return data
 
 
 class JSONParser(object):
     def __init__(self, file_name):
-        json_data = open(file_name)
-        self.data = json.load(json_data)
+        self.data = load_json(file_name)
         if self.validate_json():
-            self.regions = [region for region in self.data["Regions"]]
-            self.properties = [prop for prop in self.data["Properties"]]
+            self.regions = list(self.data["Regions"])
+            self.properties = list(self.data["Properties"])
+
+    def create_regions(self):
+        return [Region.from_json(name, region_config)
+                for name, region_config in self.data["Regions"].iteritems()]
 
     def validate_json(self, verbose=False):
         valid = True
-        try:
-            name = self.data["Name"]
-        except KeyError:
-            logging.log(logging.WARNING, "No attribute Name in configuration file.")
-            valid = False
+        for attribute in ("Name", "Version", "Author"):
+            if attribute not in self.data:
+                logging.log(logging.WARNING, "No attribute " + attribute + " in configuration file.")
+                valid = False
 
-        try:
-            version = self.data["Version"]
-        except KeyError:
-            logging.log(logging.WARNING, "No attribute Version in configuration file.")
+        regions = self.data.get("Regions")
+        if regions is None:
+            logging.log(logging.WARNING, "No attribute Regions in configuration file.")
             valid = False
-        try:
-            author = self.data["Author"]
-        except KeyError:
-            logging.log(logging.WARNING, "No attribute Author in configuration file.")
+        elif len(regions) == 0:
+            logging.log(logging.WARNING, "No Regions defined.")
             valid = False
 
-        try:
-            regions = self.data["Regions"]
-            if len(regions) is 0:
-                valid = False
-                logging.log(logging.WARNING, "No Regions defined.")
-        except KeyError:
-            logging.log(logging.WARNING, "No attribute Regions in configuration file.")
+        properties = self.data.get("Properties")
+        if properties is None:
+            logging.log(logging.WARNING, "No attribute Properties in configuration file.")
             valid = False
-
-        try:
-            properties = self.data["Properties"]
-            if len(properties) is 0:
-                valid = False
-                logging.log(logging.WARNING, "No Properties defined.")
-        except KeyError:
-            print "No attribute Properties in configuration file."
+        elif len(properties) == 0:
+            logging.log(logging.WARNING, "No Properties defined.")
             valid = False
 
-        try:
-            regions = self.data["Regions"]
-            for region in regions:
-                properties = regions["Properties"]
-                for prop in properties:
-                    if prop not in self.data["Properties"]:
+        if regions and properties:
+            for region_name, region in regions.iteritems():
+                for prop in region.get("Properties", {}):
+                    if prop not in properties:
+                        logging.log(logging.WARNING,
+                                    "Property in region not defined in Properties section.")
                         valid = False
-                        raise KeyError
-        except KeyError:
-            logging.log(logging.WARNING, "Property in region not defined in Properties section.")
 
         return valid
\ No newline at end of file
@@ -1,5 +1,8 @@
 import logging
 from copy import deepcopy
+
+import numpy as np
+
 from montepetro.seed_generators import SeedGenerator
 
 
@@ -10,9 +13,12 @@ class Model(object):
         self.seed_generator = SeedGenerator(self.seed)
         self.properties = {}
         self.regions = {}
+        # bumped on every mutation, stale get_all_properties caches die
+        self._version = 0
+        self._properties_cache = {}
 
     def add_region(self, region):
-        if region.name in self.regions.keys():
+        if region.name in self.regions:
             logging.log(logging.ERROR,
                         "Encountered duplicate region" + str(region.name) + " in Model " + self.name + ".")
             raise KeyError
@@ -23,27 +29,31 @@ class Model(object):
                 # delete any values
                 region.properties[key].values = None
             self.regions[region.name] = region
+            self._version += 1
 
     def add_property(self, prop):
-        if prop.name in self.properties.keys():
+        if prop.name in self.properties:
             logging.log(logging.ERROR,
                         "Encountered duplicate property" + str(prop.name) + " in Model " + self.name + ".")
             raise KeyError
         else:
             prop.update_seed(self.seed_generator)
             self.properties[prop.name] = prop
+            self._version += 1
 
     def add_defined_properties_to_regions(self):
         for region_name, region in self.regions.iteritems():
             for property_name, property in self.properties.iteritems():
-                if property_name not in region.properties.keys():
+                if property_name not in region.properties:
                     region.add_property(deepcopy(property))
                     region.properties[property_name].update_seed(self.seed_generator)
+        self._version += 1
 
     def add_regional_property(self, prop_name, prop):
         for region_name, region in self.regions.iteritems():
             region.properties[prop_name] = prop(region)
             region.properties[prop_name].generate_values()
+        self._version += 1
 
     def run(self, config):
         for region_name, region in self.regions.iteritems():
@@ -51,3 +61,34 @@ class Model(object):
             for property_name, property in region.properties.iteritems():
                 regional_property_config = region_config[property_name]
                 property.generate_values(**regional_property_config)
+        self._version += 1
+
+    def run_batched(self, config):
+        # regions drawing the same property with the same parameters are
+        # filled from one (R, n) draw instead of R separate calls, the
+        # regions then hold row views into the shared block
+        groups = {}
+        for region_name, region in self.regions.iteritems():
+            region_config = config[region_name]
+            for property_name, prop in region.properties.iteritems():
+                key = (property_name, tuple(sorted(region_config[property_name].items())))
+                groups.setdefault(key, []).append(prop)
+        for (property_name, params), props in groups.iteritems():
+            generator = props[0].random_generator
+            function = generator.resolve_random_number_function()
+            values = np.asarray(function(size=(len(props), generator.N), **dict(params)))
+            for row, prop in enumerate(props):
+                prop.values = values if values.ndim < 2 else values[row]
+        self._version += 1
+
+    def get_all_properties(self, attribute):
+        # collected once per model version, repeat calls (interactive
+        # visualization) reuse the same dict instead of re-walking
+        # every region and property
+        key = (self._version, attribute)
+        cached = self._properties_cache.get(key)
+        if cached is None:
+            cached = dict((region_name, region.get_properties(attribute))
+                          for region_name, region in self.regions.iteritems())
+            self._properties_cache = {key: cached}
+        return cached
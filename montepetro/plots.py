@@ -0,0 +1,79 @@
+import numpy as np
+
+from montepetro.utils import sorted_percentiles
+
+PERCENTILES = (10.0, 50.0, 90.0)
+
+# RGBA tuples resolved once, the colormap is a callable that allocates
+# a fresh tuple on every call inside the subplot loops
+_COLORS = None
+
+
+def _get_colors(plt):
+    global _COLORS
+    if _COLORS is None:
+        _COLORS = tuple(plt.get_cmap("tab10")(i) for i in range(10))
+    return _COLORS
+
+
+def visualize_input_properties(model, bins="auto", file_name=None):
+    # deferred import, matplotlib costs hundreds of milliseconds to load
+    # and batch runs that never plot should not pay for it at startup
+    import matplotlib.pyplot as plt
+    all_values = model.get_all_properties("values")
+    region_names = sorted(all_values)
+    n_properties = max(len(all_values[region_name]) for region_name in region_names)
+    colors = _get_colors(plt)
+    fig, axs = plt.subplots(len(region_names), n_properties, squeeze=False)
+    for i, region_name in enumerate(region_names):
+        for j, prop_name in enumerate(sorted(all_values[region_name])):
+            values = all_values[region_name][prop_name]
+            if values is None:
+                continue
+            hist, bin_edges = np.histogram(values, bins=bins, density=True)
+            # bar only draws rectangles, hist would re-bin what we binned
+            axs[i, j].bar(bin_edges[:-1], hist, width=np.diff(bin_edges), align="edge",
+                          edgecolor="k", facecolor=colors[j % 10], linewidth=0.3)
+            axs[i, j].set_title(str(region_name) + ": " + str(prop_name))
+    fig.tight_layout()
+    if file_name is not None:
+        fig.savefig(file_name)
+    return fig
+
+
+def visualize_model(model, bins="auto", file_name=None):
+    import matplotlib.pyplot as plt
+    all_values = model.get_all_properties("values")
+    region_names = sorted(all_values)
+    colors = _get_colors(plt)
+    fig, axs = plt.subplots(len(region_names), 2, squeeze=False)
+    percentile_values = np.empty(len(PERCENTILES))
+    for i, region_name in enumerate(region_names):
+        for j, prop_name in enumerate(sorted(all_values[region_name])):
+            values = all_values[region_name][prop_name]
+            if values is None:
+                continue
+            # sort once per property: the percentiles index the sorted
+            # array and the histogram bins it, no second O(N log N) pass
+            values = np.sort(values)
+            # one histogram pass feeds both the PDF and the survival plot
+            hist, bin_edges = np.histogram(values, bins=bins, density=True)
+            widths = np.diff(bin_edges)
+            axs[i, 0].bar(bin_edges[:-1], hist, width=widths, align="edge",
+                          edgecolor=colors[j % 10], facecolor="none",
+                          linewidth=0.5, label=str(prop_name))
+            survival = 1.0 - np.cumsum(hist*widths)
+            axs[i, 1].step(bin_edges[:-1], survival, color=colors[j % 10], label=str(prop_name))
+            sorted_percentiles(values, PERCENTILES, out=percentile_values)
+            # bin_edges is already sorted, searchsorted skips digitize's
+            # monotonicity handling and binary-searches directly
+            marker_bins = np.searchsorted(bin_edges, percentile_values, side="right")
+            for marker_bin in marker_bins:
+                edge = bin_edges[min(marker_bin, len(bin_edges) - 1)]
+                axs[i, 1].axvline(edge, color=colors[j % 10], linestyle="--", linewidth=0.5)
+        axs[i, 0].set_title("PDF " + str(region_name))
+        axs[i, 1].set_title("SF " + str(region_name))
+    fig.tight_layout()
+    if file_name is not None:
+        fig.savefig(file_name)
+    return fig
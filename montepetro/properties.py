@@ -1,8 +1,18 @@
 import numpy as np
+
+try:
+    # optional, fuses element-wise kernels into one pass over memory
+    import numexpr
+except ImportError:
+    numexpr = None
+
 from montepetro.generators import RandomGenerator
+from montepetro.utils import dump_json, resolve_random_number_function
 
 
 class Property(object):
+    __slots__ = ("name", "desc", "values", "mean")
+
     def __init__(self,  name=None, desc=None):
         self.name = name
         self.desc = desc
@@ -14,82 +24,95 @@ class Property(object):
     def update_seed(self, *args, **kwargs):
         pass
 
+    def copy(self):
+        # fresh instance carrying only the definition, not the state
+        return self.__class__(name=self.name, desc=self.desc)
+
+    def to_json_dict(self):
+        # values stay an ndarray here, dump_json converts them while
+        # streaming to the file instead of copying up front
+        return {"Name": self.name, "Desc": self.desc, "Values": self.values}
+
+    def to_json(self, file_name, pretty=False):
+        dump_json(self.to_json_dict(), file_name, pretty=pretty)
+
 
 class RandomProperty(Property):
-    def __init__(self, seed_generator=None, n=None, random_number_function=None, *args, **kwargs):
+    __slots__ = ("seed", "seed_generator", "n", "random_number_function",
+                 "random_state_class", "random_generator")
+
+    def __init__(self, seed_generator=None, n=None, random_number_function=None,
+                 random_state_class=None, *args, **kwargs):
         Property.__init__(self, *args, **kwargs)
         self.seed = None
         self.seed_generator = seed_generator
         self.n = n
-        self.random_number_function = random_number_function
+        self.random_number_function = resolve_random_number_function(random_number_function)
+        self.random_state_class = random_state_class
         self.random_generator = None
 
         if self.seed_generator is not None:
             self.update_seed(seed_generator)
-            self.random_generator = RandomGenerator(self.seed, n, random_number_function)
 
         self.mean = None
 
     def update_seed(self, seed_generator):
         self.seed = seed_generator.request_seed()
-        self.random_generator = RandomGenerator(self.seed, self.n, self.random_number_function)
+        self.random_generator = RandomGenerator(self.seed, self.n, self.random_number_function,
+                                                random_state_class=self.random_state_class)
 
     def generate_values(self, *args, **kwargs):
         self.values = self.random_generator.get_n_random_numbers(*args, **kwargs)
 
+    def copy(self):
+        return self.__class__(n=self.n, random_number_function=self.random_number_function,
+                              random_state_class=self.random_state_class,
+                              name=self.name, desc=self.desc)
+
     def calculate_property_statistics(self):
         self.mean = np.mean(self.values)
 
 
 class RegionalProperty(Property):
+    __slots__ = ("region", "p10", "p50", "p90")
+
     def __init__(self, region, *args, **kwargs):
         Property.__init__(self, *args, **kwargs)
         self.region = region
 
+    def calculation(self):
+        return None
+
+    def generate_values(self):
+        self.values = self.calculation()
+
+    def calculate_property_statistics(self):
+        self.p90, self.p50, self.p10 = np.percentile(self.values, [10, 50, 90])
+        self.mean = np.mean(self.values)
+
 
 class OriginalOilInPlace(RegionalProperty):
-    def __init__(self, region, *args, **kwargs):
-        Property.__init__(self, *args, **kwargs)
-        self.region = region
+    __slots__ = ()
 
     def calculation(self):
         phi = self.region.properties["Porosity"].values
         area = self.region.properties["Area"].values
         sw = self.region.properties["Sw"].values
+        if numexpr is not None:
+            return numexpr.evaluate("area*phi*(1.0-sw)")
         ooip = area*phi*(1.0-sw)
         return ooip
 
-    def calculate_property_statistics(self):
-        self.p90 = np.percentile(self.values, 10)
-        self.p50 = np.percentile(self.values, 50)
-        self.p10 = np.percentile(self.values, 90)
-        self.mean = np.mean(self.values)
-
-    def generate_values(self):
-        self.values = self.calculation()
-
 
 class ModelOriginalOilInPlace(RegionalProperty):
+    __slots__ = ("model",)
+
     def __init__(self, model, *args, **kwargs):
         Property.__init__(self, *args, **kwargs)
         self.model = model
 
     def calculation(self):
-        ooips = []
-        for region_name, region in self.model.regions.iteritems():
-            ooips.append(region.properties["ooip"].values)
-
-        # assumes len(arrlist) > 0
-        sum = ooips[0].copy()
-        for a in ooips[1:]:
-            sum += a
-        return sum
-
-    def calculate_property_statistics(self):
-        self.p90 = np.percentile(self.values, 10)
-        self.p50 = np.percentile(self.values, 50)
-        self.p10 = np.percentile(self.values, 90)
-        self.mean = np.mean(self.values)
-
-    def generate_values(self):
-        self.values = self.calculation()
+        ooips = [region.properties["ooip"].values
+                 for region in self.model.regions.values()]
+        # assumes len(ooips) > 0
+        return np.sum(ooips, axis=0)
@@ -1,22 +1,79 @@
-import matplotlib.pyplot as plot
 import numpy as np
 import logging
 
+from montepetro.utils import dump_json
+
 
 class Region(object):
+    __slots__ = ("parent", "name", "properties")
+
     def __init__(self, parent=None, name=None):
         self.parent = parent
         self.name = name
         self.properties = {}
 
+    @classmethod
+    def from_json(cls, name, region_config):
+        # single pass over the already parsed configuration entry
+        parent = region_config.get("Parent Region")
+        if parent == "None":
+            parent = None
+        return cls(parent=parent, name=name)
+
+    def __contains__(self, prop):
+        return prop.name in self.properties
+
     def add_property(self, prop):
-        if prop.name in self.properties.keys():
+        if prop in self:
             logging.log(logging.ERROR,
                         "Encountered duplicate property" + str(prop.name) + " in region " + str(self.name) + ".")
             raise KeyError
         else:
             self.properties[prop.name] = prop
 
+    def add_properties(self, *props):
+        # single membership check up front instead of one lookup per property
+        names = [prop.name for prop in props]
+        duplicates = set(self.properties) & set(names)
+        if duplicates or len(set(names)) != len(names):
+            logging.log(logging.ERROR,
+                        "Encountered duplicate properties " + str(sorted(duplicates)) + " in region " + str(self.name) + ".")
+            raise KeyError
+        for prop in props:
+            self.properties[prop.name] = prop
+
+    def to_json_dict(self):
+        json_dict = {"Name": self.name, "Properties": {}}
+        for prop_name, prop in self.properties.iteritems():
+            json_dict["Properties"][prop_name] = prop.to_json_dict()
+        return json_dict
+
+    def to_json(self, file_name, pretty=False):
+        dump_json(self.to_json_dict(), file_name, pretty=pretty)
+
+    def get_properties(self, attribute):
+        # EAFP: one getattr per property, hasattr would do the lookup twice
+        attributes = {}
+        for prop_name, prop in self.properties.iteritems():
+            try:
+                attributes[prop_name] = getattr(prop, attribute)
+            except AttributeError:
+                continue
+        return attributes
+
+    def get_property_values(self):
+        # stack all property values into one contiguous (M, N) array
+        # so bulk operations run once instead of once per property
+        names = self.properties.keys()
+        values = np.stack([self.properties[name].values for name in names])
+        return names, values
+
+    def calculate_property_statistics(self):
+        names, values = self.get_property_values()
+        means = np.mean(values, axis=1)
+        for name, mean in zip(names, means):
+            self.properties[name].mean = mean
+
     def __str__(self):
         str = ""
         str += "Region Name: " + self.name
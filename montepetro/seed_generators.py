@@ -5,8 +5,10 @@ import logging
 class SeedGenerator(object):
     def __init__(self, seed):
         self.seed = seed
-        np.random.seed(self.seed)
-        self.seed_random_function = np.random.randint
+        # a private stream yields the same seeds as the old global
+        # np.random.seed/randint pair without clobbering the global state
+        self.random_state = np.random.RandomState(self.seed)
+        self.seed_random_function = self.random_state.randint
         self.seeds = []
 
     def request_seed(self):
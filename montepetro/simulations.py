@@ -0,0 +1,151 @@
+import logging
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from montepetro.models import Model
+from montepetro.regions import Region
+
+
+def run_simulation(args):
+    model, config = args
+    model.run(config)
+    return model
+
+
+class Simulation(object):
+    __slots__ = ("name", "seed", "n_simulations", "n_jobs", "backend",
+                 "models", "results", "pool", "_hash")
+
+    def __init__(self, name, seed, n_simulations, n_jobs=None, backend="threads"):
+        self.name = name
+        self.seed = seed
+        self.n_simulations = n_simulations
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.models = {}
+        self.results = None
+        self.pool = None
+        self._hash = None
+
+    def __eq__(self, other):
+        return (isinstance(other, Simulation) and self.name == other.name
+                and self.seed == other.seed and self.n_simulations == other.n_simulations)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        # identity fields never change after construction, hash once
+        if self._hash is None:
+            self._hash = hash((self.name, self.seed, self.n_simulations))
+        return self._hash
+
+    def add_model(self, model):
+        # keyed by name, duplicate detection is a single dict lookup
+        if model.name in self.models:
+            logging.log(logging.ERROR,
+                        "Encountered duplicate model" + str(model.name) + " in Simulation " + self.name + ".")
+            raise KeyError
+        self.models[model.name] = model
+
+    def add_models(self, *models):
+        for model in models:
+            self.add_model(model)
+
+    def setup_model(self, model, run_id):
+        # rebuild the model from the property definitions instead of
+        # deepcopying the whole object graph for every run
+        run_model = Model(model.name, self.seed + run_id)
+        for region in model.regions.values():
+            run_region = Region(parent=region.parent, name=region.name)
+            for prop in region.properties.values():
+                run_region.add_property(prop.copy())
+            run_model.add_region(run_region)
+        # the seed generator is fully consumed during setup and its
+        # np.random.randint reference does not pickle to worker processes
+        run_model.seed_generator = None
+        return run_model
+
+    def get_pool(self):
+        # the pool is created once and reused by every run() call,
+        # repeated runs do not pay the worker start-up cost again
+        if self.pool is None:
+            if self.backend == "threads":
+                # numpy releases the GIL while drawing, threads share the
+                # model arrays and skip all pickling
+                self.pool = ThreadPool(self.n_jobs)
+            else:
+                self.pool = Pool(self.n_jobs)
+        return self.pool
+
+    def validate_config(self, model, config):
+        # checked once up front, the workers then run n_simulations times
+        # without ever hitting a missing entry mid-flight
+        for region_name, region in model.regions.iteritems():
+            if region_name not in config:
+                logging.log(logging.ERROR,
+                            "No configuration for region " + str(region_name) + ".")
+                raise KeyError
+            region_config = config[region_name]
+            for property_name in region.properties:
+                if property_name not in region_config:
+                    logging.log(logging.ERROR,
+                                "No configuration for property " + str(property_name) +
+                                " in region " + str(region_name) + ".")
+                    raise KeyError
+
+    def run(self, config):
+        self.results = {}
+        for model in self.models.values():
+            self.validate_config(model, config)
+            tasks = [(self.setup_model(model, run_id), config)
+                     for run_id in range(self.n_simulations)]
+            if self.n_jobs is None or self.n_jobs == 1:
+                finished = [run_simulation(task) for task in tasks]
+            else:
+                finished = self.get_pool().map(run_simulation, tasks)
+            self.results[model.name] = finished
+        return self.results
+
+    def run_batched(self, config):
+        # one draw of shape (n_simulations, n) per property instead of
+        # n_simulations separate calls, each run then holds a row view
+        self.results = {}
+        for model in self.models.values():
+            self.validate_config(model, config)
+            run_models = [self.setup_model(model, run_id)
+                          for run_id in range(self.n_simulations)]
+            for region_name, region in run_models[0].regions.iteritems():
+                region_config = config[region_name]
+                for property_name, prop in region.properties.iteritems():
+                    generator = prop.random_generator
+                    function = generator.resolve_random_number_function()
+                    values = np.asarray(function(size=(self.n_simulations, generator.N),
+                                                 **region_config[property_name]))
+                    for run_id, run_model in enumerate(run_models):
+                        run_prop = run_model.regions[region_name].properties[property_name]
+                        if values.ndim < 2:
+                            run_prop.values = values
+                        else:
+                            run_prop.values = values[run_id]
+            self.results[model.name] = run_models
+        return self.results
+
+    def get_result_values(self, model_name, region_name, property_name, dtype=None):
+        # one preallocated (n_simulations, n) matrix, bulk statistics can
+        # then run on contiguous memory instead of a list of arrays;
+        # dtype=np.float32 halves the memory traffic of bandwidth-bound
+        # reductions at the cost of precision
+        run_models = self.results[model_name]
+        n = len(run_models[0].regions[region_name].properties[property_name].values)
+        values = np.empty((len(run_models), n), dtype=dtype or np.float64)
+        for run_id, run_model in enumerate(run_models):
+            values[run_id, :] = run_model.regions[region_name].properties[property_name].values
+        return values
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -1,14 +1,72 @@
 __author__ = 'lmosser'
-import scipy.stats
+import json
+import logging
+
 import numpy as np
 
 
+def json_default(obj):
+    # let json.dump convert arrays on the fly, tolist runs in C and the
+    # caller never materializes an intermediate copy
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(repr(obj) + " is not JSON serializable")
+
+
+def dump_json(json_dict, file_name, pretty=False):
+    # compact output by default, the indented form is much slower to write
+    with open(file_name, "w") as json_file:
+        if pretty:
+            json.dump(json_dict, json_file, indent=4, default=json_default)
+        else:
+            json.dump(json_dict, json_file, separators=(",", ":"), default=json_default)
+
+
 def truncated_normal_rvs(low=0.0, high=1.0, mean=0.5, std=1.0, size=1):
-    normal = scipy.stats.norm(mean, std)
+    # frozen distributions are cached per parameter set, repeated draws
+    # with the same parameters reuse one scipy object
+    from montepetro.distributions import frozen
+    normal = frozen("norm", loc=mean, scale=std)
     u = np.random.uniform(low=0.0, high=1.0, size=size)
     x = normal.ppf(normal.cdf(low) + u * (normal.cdf(high) - normal.cdf(low)))
     return x
 
+def sorted_percentiles(sorted_values, percentiles, out=None):
+    # percentiles of an already sorted array, same linear interpolation
+    # as np.percentile but without paying its O(N log N) sort again;
+    # out= reuses a caller-owned buffer across repeated calls
+    n = len(sorted_values)
+    if out is None:
+        out = np.empty(len(percentiles))
+    for k, percentile in enumerate(percentiles):
+        position = percentile/100.0*(n - 1)
+        low = int(position)
+        high = min(low + 1, n - 1)
+        fraction = position - low
+        out[k] = sorted_values[low]*(1.0 - fraction) + sorted_values[high]*fraction
+    return out
+
+
 def constant_value(*args, **kwargs):
     value = kwargs.get("value")
     return value
+
+
+RANDOM_NUMBER_FUNCTIONS = {"uniform": np.random.uniform,
+                           "normal": np.random.normal,
+                           "lognormal": np.random.lognormal,
+                           "triangular": np.random.triangular,
+                           "truncated_normal": truncated_normal_rvs,
+                           "constant": constant_value}
+
+
+def resolve_random_number_function(function):
+    # configuration files name functions as strings, resolve them to the
+    # callable once at load time instead of once per draw
+    if function is None or callable(function):
+        return function
+    try:
+        return RANDOM_NUMBER_FUNCTIONS[function]
+    except KeyError:
+        logging.log(logging.ERROR, "Unknown random number function " + str(function) + ".")
+        raise
@@ -14,6 +14,7 @@ from montepetro.json_parser import JSONParser
 from montepetro.regions import Region
 from montepetro.seed_generators import SeedGenerator
 from montepetro.models import Model
+from montepetro.simulations import Simulation
 from montepetro.utils import truncated_normal_rvs, constant_value
 
 
@@ -38,6 +39,30 @@ class TestRandomGenerators(unittest.TestCase):
         self.assertAlmostEqual(gen.get_random_number(low=0.0, high=1.0), np.array(0.7004371218578347), places=5)
         # How to test get N random numbers?
 
+    def test_random_generator_private_state(self):
+        # a generator with its own random state must not disturb the global stream
+        np.random.seed(self.seed)
+        expected_global = list(np.random.uniform(size=self.N))
+
+        np.random.seed(self.seed)
+        gen = RandomGenerator(self.seed, self.N, np.random.uniform,
+                              random_state_class=np.random.RandomState)
+        private_values = list(gen.get_n_random_numbers(low=0.0, high=1.0))
+        self.assertListEqual(list(np.random.uniform(size=self.N)), expected_global)
+
+        # resetting the seed reproduces the private stream
+        gen.set_seed()
+        self.assertListEqual(list(gen.get_n_random_numbers(low=0.0, high=1.0)), private_values)
+
+    def test_make_rng(self):
+        from montepetro.generators import make_rng
+
+        # same seed, same stream, independent of the global state
+        a = make_rng(self.seed).standard_normal(self.N)
+        b = make_rng(self.seed).standard_normal(self.N)
+        self.assertTrue(np.array_equal(a, b))
+        self.assertFalse(np.array_equal(a, make_rng(self.seed + 1).standard_normal(self.N)))
+
 
 class TestProperty(unittest.TestCase):
     def setUp(self):
@@ -111,6 +136,15 @@ class TestJSONConfigLoader(unittest.TestCase):
 
         self.assertEquals(len(json.data["Properties"]), 1)
 
+        # a second parser on the same unchanged file reuses the parsed data
+        json_again = JSONParser(self.file_name)
+        self.assertTrue(json_again.data is json.data)
+
+        regions = json.create_regions()
+        self.assertEquals(len(regions), 1)
+        self.assertEquals(regions[0].name, "Region_A")
+        self.assertEquals(regions[0].parent, None)
+
     def tearDown(self):
         os.chdir(self.cwd)
 
@@ -139,8 +173,64 @@ class TestRegions(unittest.TestCase):
 
         region.add_property(property)
         self.assertEqual(len(region.properties), 1)
+        self.assertTrue(property in region)
         self.assertRaises(KeyError, region.add_property, property)
 
+        property_a = MockProperty()
+        property_a.name = "MockPropertyA"
+        property_b = MockProperty()
+        property_b.name = "MockPropertyB"
+
+        region.add_properties(property_a, property_b)
+        self.assertEqual(len(region.properties), 3)
+        self.assertRaises(KeyError, region.add_properties, property_a)
+
+    def test_region_property_values(self):
+        region = Region(parent=None, name="Test Region")
+        property_a = MockProperty()
+        property_a.name = "MockPropertyA"
+        property_a.values = np.ones(5)
+        property_b = MockProperty()
+        property_b.name = "MockPropertyB"
+        property_b.values = 2.0*np.ones(5)
+
+        region.add_property(property_a)
+        region.add_property(property_b)
+
+        names, values = region.get_property_values()
+        self.assertEqual(values.shape, (2, 5))
+        self.assertEqual(sorted(names), ["MockPropertyA", "MockPropertyB"])
+
+        region.calculate_property_statistics()
+        self.assertAlmostEqual(region.properties["MockPropertyA"].mean, 1.0)
+        self.assertAlmostEqual(region.properties["MockPropertyB"].mean, 2.0)
+
+        means = region.get_properties("mean")
+        self.assertAlmostEqual(means["MockPropertyA"], 1.0)
+        self.assertAlmostEqual(means["MockPropertyB"], 2.0)
+        self.assertEqual(region.get_properties("no_such_attribute"), {})
+
+    def test_region_to_json(self):
+        import json
+        import tempfile
+
+        region = Region(parent=None, name="Test Region")
+        property = MockProperty()
+        property.values = np.ones(3)
+        region.add_property(property)
+
+        handle, file_name = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            region.to_json(file_name)
+            with open(file_name) as json_file:
+                json_dict = json.load(json_file)
+        finally:
+            os.remove(file_name)
+
+        self.assertEqual(json_dict["Name"], "Test Region")
+        self.assertEqual(json_dict["Properties"]["MockProperty"]["Values"], [1.0, 1.0, 1.0])
+
     def test_region_output(self):
         region = Region(parent=None, name="Test Region")
         self.assertEqual(region.__str__(), "Region Name: Test Region")
@@ -173,6 +263,11 @@ class TestSeedGenerator(unittest.TestCase):
 
         # Therefore SeedGenerator instance will need to be hard coded into the Model class
 
+        # creating a SeedGenerator must not disturb the global numpy stream
+        np.random.seed(self.seed)
+        seed_generator_c = SeedGenerator(self.seed + 1)
+        self.assertEqual(np.random.randint(low=1, high=10000000), seed1)
+
     def tearDown(self):
         pass
 
@@ -281,6 +376,162 @@ class TestModel(unittest.TestCase):
         pass
 
 
+class TestModelProperties(unittest.TestCase):
+    def setUp(self):
+        self.seed = 100
+        self.n = 5
+
+    def test_get_all_properties(self):
+        model = Model("Test Model", self.seed)
+        model.add_property(RandomProperty(name="Area", n=self.n, random_number_function=mock_random))
+        model.add_region(Region(name="Region A"))
+        model.add_defined_properties_to_regions()
+        model.run({"Region A": {"Area": {"value": 2.0}}})
+
+        all_values = model.get_all_properties("values")
+        self.assertAlmostEqual(np.sum(all_values["Region A"]["Area"]), 2.0*self.n)
+
+        # repeat calls reuse the cached collection until the model mutates
+        self.assertTrue(model.get_all_properties("values") is all_values)
+        model.add_property(RandomProperty(name="Porosity", n=self.n, random_number_function=mock_random))
+        self.assertFalse(model.get_all_properties("values") is all_values)
+
+    def test_run_batched(self):
+        # regions sharing parameters are drawn as one (R, n) block
+        model = Model("Test Model", self.seed)
+        model.add_property(RandomProperty(name="Area", n=self.n, random_number_function=mock_random))
+        model.add_region(Region(name="Region A"))
+        model.add_region(Region(name="Region B"))
+        model.add_defined_properties_to_regions()
+        model.run_batched({"Region A": {"Area": {"value": 2.0}},
+                           "Region B": {"Area": {"value": 2.0}}})
+
+        for region_name in ("Region A", "Region B"):
+            values = model.regions[region_name].properties["Area"].values
+            self.assertEqual(values.shape, (self.n,))
+            self.assertAlmostEqual(np.sum(values), 2.0*self.n)
+
+    def tearDown(self):
+        pass
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.seed = 100
+        self.n = 5
+        self.n_simulations = 3
+        self.config = {"Region A": {"Area": {"value": 2.0}}}
+
+    def build_model(self):
+        model = Model("Test Model", self.seed)
+        model.add_property(RandomProperty(name="Area", n=self.n, random_number_function=mock_random))
+        model.add_region(Region(name="Region A"))
+        model.add_defined_properties_to_regions()
+        return model
+
+    def test_simulation(self):
+        simulation = Simulation("Test Simulation", self.seed, self.n_simulations)
+        model = self.build_model()
+        simulation.add_model(model)
+        self.assertRaises(KeyError, simulation.add_model, model)
+
+        results = simulation.run(self.config)
+        self.assertEqual(len(results["Test Model"]), self.n_simulations)
+        for run_model in results["Test Model"]:
+            values = run_model.regions["Region A"].properties["Area"].values
+            self.assertEqual(len(values), self.n)
+            self.assertAlmostEqual(np.sum(values), 2.0*self.n)
+
+        # the base model must not be touched by the runs
+        self.assertEqual(model.regions["Region A"].properties["Area"].values, None)
+
+        values = simulation.get_result_values("Test Model", "Region A", "Area")
+        self.assertEqual(values.shape, (self.n_simulations, self.n))
+        self.assertAlmostEqual(np.sum(values), 2.0*self.n*self.n_simulations)
+
+        single_values = simulation.get_result_values("Test Model", "Region A", "Area",
+                                                     dtype=np.float32)
+        self.assertEqual(single_values.dtype, np.float32)
+        self.assertAlmostEqual(np.sum(single_values), 2.0*self.n*self.n_simulations)
+
+        # incomplete configurations are rejected before any run starts
+        self.assertRaises(KeyError, simulation.run, {})
+        self.assertRaises(KeyError, simulation.run, {"Region A": {}})
+
+    def test_simulation_run_batched(self):
+        simulation = Simulation("Test Simulation", self.seed, self.n_simulations)
+        simulation.add_model(self.build_model())
+
+        results = simulation.run_batched(self.config)
+        self.assertEqual(len(results["Test Model"]), self.n_simulations)
+
+        values = simulation.get_result_values("Test Model", "Region A", "Area")
+        self.assertEqual(values.shape, (self.n_simulations, self.n))
+        self.assertAlmostEqual(np.sum(values), 2.0*self.n*self.n_simulations)
+
+    def test_simulation_hash(self):
+        simulation_a = Simulation("Test Simulation", self.seed, self.n_simulations)
+        simulation_b = Simulation("Test Simulation", self.seed, self.n_simulations)
+        simulation_c = Simulation("Other Simulation", self.seed, self.n_simulations)
+
+        self.assertEqual(simulation_a, simulation_b)
+        self.assertEqual(hash(simulation_a), hash(simulation_b))
+        self.assertNotEqual(simulation_a, simulation_c)
+
+        lookup = {simulation_a: 1}
+        self.assertEqual(lookup[simulation_b], 1)
+
+    def test_simulation_backends(self):
+        for backend in ["threads", "processes"]:
+            simulation = Simulation("Test Simulation", self.seed, self.n_simulations,
+                                    n_jobs=2, backend=backend)
+            simulation.add_model(self.build_model())
+            results = simulation.run(self.config)
+            self.assertEqual(len(results["Test Model"]), self.n_simulations)
+            simulation.close()
+
+    def test_simulation_pool_reuse(self):
+        simulation = Simulation("Test Simulation", self.seed, self.n_simulations, n_jobs=2)
+        simulation.add_model(self.build_model())
+
+        simulation.run(self.config)
+        pool = simulation.pool
+        results = simulation.run(self.config)
+
+        # both runs must go through the same worker pool
+        self.assertTrue(simulation.pool is pool)
+        self.assertEqual(len(results["Test Model"]), self.n_simulations)
+        simulation.close()
+        self.assertEqual(simulation.pool, None)
+
+    def tearDown(self):
+        pass
+
+
+class TestPlots(unittest.TestCase):
+    def setUp(self):
+        self.seed = 100
+        self.n = 50
+
+    def test_visualize_smoke(self):
+        import matplotlib.pyplot as plt
+        from montepetro.plots import visualize_model, visualize_input_properties
+        model = Model("Test Model", self.seed)
+        model.add_property(RandomProperty(name="Area", n=self.n, random_number_function=np.random.uniform))
+        model.add_region(Region(name="Region A"))
+        model.add_defined_properties_to_regions()
+        model.run({"Region A": {"Area": {"low": 0.0, "high": 1.0}}})
+
+        fig = visualize_model(model)
+        self.assertEqual(len(fig.axes), 2)
+        fig = visualize_input_properties(model)
+        self.assertEqual(len(fig.axes), 1)
+        plt.close("all")
+
+    def tearDown(self):
+        pass
+
+
 class TestOilInPlaceCalculation(unittest.TestCase):
     def setUp(self):
         pass
@@ -345,6 +596,113 @@ class TestOilInPlaceCalculation(unittest.TestCase):
     def tearDown(self):
         pass
 
+class TestEquationParser(unittest.TestCase):
+    def setUp(self):
+        self.variables = {"area": 2.0*np.ones(5), "phi": 0.5*np.ones(5), "sw": 0.1*np.ones(5)}
+
+    def test_evaluate(self):
+        from montepetro.equation_parser import evaluate, FormulaSyntaxError
+
+        ooip = evaluate("area*phi*(1.0-sw)", self.variables)
+        self.assertAlmostEqual(np.sum(ooip), 5*0.9, 4)
+
+        self.assertAlmostEqual(evaluate("-a + 2.0**2", {"a": 1.0}), 3.0)
+
+        self.assertRaises(FormulaSyntaxError, evaluate, "area*", self.variables)
+        self.assertRaises(FormulaSyntaxError, evaluate, "area*undefined", self.variables)
+        self.assertRaises(FormulaSyntaxError, evaluate, "__import__('os')", self.variables)
+        self.assertRaises(FormulaSyntaxError, evaluate, "area if sw else phi", self.variables)
+        self.assertRaises(FormulaSyntaxError, evaluate, "a"*1000, self.variables)
+
+    def test_evaluate_bytecode(self):
+        from montepetro.equation_parser import (compile_to_bytecode, evaluate_bytecode,
+                                                eval_node, parse_formula)
+
+        formula = "area*phi*(1.0-sw)"
+        by_bytecode = evaluate_bytecode(formula, self.variables)
+        by_tree_walk = eval_node(parse_formula(formula), self.variables)
+        self.assertListEqual(list(by_bytecode), list(by_tree_walk))
+
+        # the compiled program is reused across evaluations
+        self.assertTrue(compile_to_bytecode(formula) is compile_to_bytecode(formula))
+
+    def test_nary_chains(self):
+        from montepetro.equation_parser import (compile_to_bytecode, evaluate_bytecode,
+                                                eval_node, parse_formula, OP_MULN, OP_ADDN)
+
+        # a*b*c*d collapses to one n-ary reduction, not three dispatches
+        ops, consts, names = compile_to_bytecode("area*phi*sw*2.0")
+        self.assertListEqual([op for op, arg in ops if op == OP_MULN], [OP_MULN])
+        self.assertEqual(dict(ops)[OP_MULN], 4)
+        ops, consts, names = compile_to_bytecode("area + phi + sw + 1.0")
+        self.assertEqual(dict(ops)[OP_ADDN], 4)
+
+        for formula in ("area*phi*sw*2.0", "area + phi + sw + 1.0", "area*phi + sw*area*phi"):
+            by_bytecode = evaluate_bytecode(formula, self.variables)
+            by_tree_walk = eval_node(parse_formula(formula), self.variables)
+            self.assertTrue(np.allclose(by_bytecode, by_tree_walk))
+
+    def test_scratch_buffers(self):
+        from montepetro.equation_parser import evaluate_bytecode, eval_node, parse_formula
+
+        # the out= scratch path must never write into caller arrays
+        originals = dict((name, value.copy()) for name, value in self.variables.iteritems())
+        for formula in ("(area*phi - sw)/(area + phi)", "-area*phi**2.0 - sw",
+                        "area/2.0 - phi*(sw + 1.0)", "2.0**phi + area"):
+            by_bytecode = evaluate_bytecode(formula, self.variables)
+            by_tree_walk = eval_node(parse_formula(formula), self.variables)
+            self.assertTrue(np.allclose(by_bytecode, by_tree_walk))
+        for name, value in originals.iteritems():
+            self.assertTrue(np.array_equal(self.variables[name], value))
+
+        # results of consecutive evaluations do not share a buffer
+        a = evaluate_bytecode("area*phi - sw", self.variables)
+        b = evaluate_bytecode("area*phi - sw", self.variables)
+        self.assertFalse(a is b)
+        self.assertTrue(np.allclose(a, b))
+
+    def test_evaluate_many(self):
+        from montepetro.equation_parser import evaluate_many
+
+        results = evaluate_many({"ooip": "area*phi*(1.0-sw)",
+                                 "pore_volume": "area*phi"}, self.variables)
+        self.assertAlmostEqual(np.sum(results["ooip"]), 5*0.9, 4)
+        self.assertAlmostEqual(np.sum(results["pore_volume"]), 5*1.0, 4)
+
+        # identical formulas share one memoized result array
+        shared = evaluate_many({"a": "area*phi", "b": "area*phi"}, self.variables)
+        self.assertTrue(shared["a"] is shared["b"])
+
+    def test_fold_constants(self):
+        from montepetro.equation_parser import compile_to_bytecode, evaluate
+
+        # constant sub-expressions collapse to a single folded constant
+        ops, consts, names = compile_to_bytecode("2.0*3.0 + a - 1.0/0.0*0.0")
+        self.assertTrue(6.0 in consts)
+        self.assertEqual(names, ["a"])
+
+        self.assertAlmostEqual(evaluate("2.0*3.0 + a", {"a": 1.0}), 7.0)
+
+    def test_parse_cache(self):
+        from montepetro import equation_parser
+        from montepetro.equation_parser import parse_formula
+
+        # the same formula string must parse exactly once
+        self.assertTrue(parse_formula("area*phi") is parse_formula("area*phi"))
+
+        equation_parser.clear_cache()
+        self.assertEqual(len(equation_parser._ast_cache), 0)
+
+        # the cache is bounded, the oldest entry is evicted first
+        for i in range(equation_parser.MAX_CACHED_FORMULAS + 1):
+            parse_formula("a + " + str(i))
+        self.assertEqual(len(equation_parser._ast_cache), equation_parser.MAX_CACHED_FORMULAS)
+        self.assertFalse("a + 0" in equation_parser._ast_cache)
+
+    def tearDown(self):
+        pass
+
+
 class TestUtils(unittest.TestCase):
     def setUp(self):
         pass
@@ -355,8 +713,59 @@ class TestUtils(unittest.TestCase):
         b = truncated_normal_rvs(low=0.0, high=1.0, mean=0.5, std=0.1)
         self.assertEqual(0<b<1.0, True)
 
+    def test_frozen_distributions(self):
+        from montepetro.distributions import frozen
+
+        # same parameters reuse one cached frozen distribution
+        a = frozen("norm", loc=0.5, scale=1.0)
+        self.assertTrue(frozen("norm", loc=0.5, scale=1.0) is a)
+        self.assertFalse(frozen("norm", loc=0.0, scale=1.0) is a)
+        self.assertAlmostEqual(a.mean(), 0.5)
+        self.assertRaises(KeyError, frozen, "no_such_distribution")
+
+    def test_sorted_percentiles(self):
+        from montepetro.utils import sorted_percentiles
+
+        values = np.sort(np.random.RandomState(666).uniform(size=101))
+        percentiles = (10.0, 50.0, 90.0)
+        expected = np.percentile(values, percentiles)
+        self.assertTrue(np.allclose(sorted_percentiles(values, percentiles), expected))
+
+        # a caller-owned buffer is filled and handed back
+        out = np.empty(3)
+        self.assertTrue(sorted_percentiles(values, percentiles, out=out) is out)
+        self.assertTrue(np.allclose(out, expected))
+
+    def test_rvs_fast_path(self):
+        from montepetro.distributions import rvs
+
+        # hot distributions bypass scipy: one standard draw plus affine
+        state = np.random.RandomState(666)
+        values = rvs("norm", 10, random_state=state, loc=2.0, scale=0.5)
+        expected = np.random.RandomState(666).standard_normal(10)*0.5 + 2.0
+        self.assertTrue(np.allclose(values, expected))
+
+        # everything else falls back to the frozen scipy object
+        values = rvs("triang", 10, random_state=np.random.RandomState(666), c=0.5)
+        self.assertEqual(values.shape, (10,))
+
     def test_constant_value(self):
         self.assertEqual(constant_value(value=1.0), 1.0)
 
+    def test_resolve_random_number_function(self):
+        from montepetro.utils import resolve_random_number_function
+
+        self.assertEqual(resolve_random_number_function("constant"), constant_value)
+        self.assertEqual(resolve_random_number_function("uniform"), np.random.uniform)
+        self.assertEqual(resolve_random_number_function(constant_value), constant_value)
+        self.assertEqual(resolve_random_number_function(None), None)
+        self.assertRaises(KeyError, resolve_random_number_function, "no_such_function")
+
+        # names resolve once at construction time
+        prop = RandomProperty(seed_generator=MockSeedGenerator(666), n=5,
+                              random_number_function="constant", name="Constant Property")
+        prop.generate_values(value=2.0)
+        self.assertAlmostEqual(prop.values, 2.0)
+
     def tearDown(self):
         pass
\ No newline at end of file